@@ -1,10 +1,95 @@
 #!/bin/bash
 
-# Get the directory of the script
-SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" &> /dev/null && pwd)"
+# Get the physical directory of the script, so the test executable path below is
+# absolute and symlink-free for every one of its many launches
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" &> /dev/null && pwd -P)"
 BUILD_DIR="$SCRIPT_DIR/build"
 TEST_EXECUTABLE="$BUILD_DIR/vyn"
 LOG_FILE="$BUILD_DIR/test_output.log"
+# Test names from the last --list-tests run, reused while the executable is unchanged
+TEST_LIST_CACHE="$BUILD_DIR/test_list.cache"
+USE_CACHE=1
+# Microseconds each test case took on its last run, used to start slow tests first
+TEST_TIMINGS="$BUILD_DIR/test_timings"
+
+# Rule printed around each test's report
+SEPARATOR="------------------------------------------------------------"
+
+# Number of test cases to run concurrently (default: one per CPU)
+JOBS="$(nproc 2>/dev/null || echo 1)"
+# Number of test cases handed to a single vyn process (default: one per process)
+BATCH_SIZE=1
+# Cap, in KiB, on how much of each test's output is copied into the log (0: no cap)
+MAX_OUTPUT_KB=0
+# Whether output from passing tests is kept in the log
+LOG_PASSED_OUTPUT=1
+# Catch2 test specs (names or tags such as [parser]) selecting which tests to run
+TEST_SPECS=()
+
+usage() {
+    echo "Usage: $0 [-j|--jobs N] [-b|--batch-size N] [--max-output KIB] [--failures-only] [--no-cache] [test spec...]" >&2
+    exit 1
+}
+
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -j|--jobs)
+            [ $# -ge 2 ] || usage
+            JOBS="$2"
+            shift 2
+            ;;
+        -b|--batch-size)
+            [ $# -ge 2 ] || usage
+            BATCH_SIZE="$2"
+            shift 2
+            ;;
+        --max-output)
+            [ $# -ge 2 ] || usage
+            MAX_OUTPUT_KB="$2"
+            shift 2
+            ;;
+        --failures-only)
+            LOG_PASSED_OUTPUT=0
+            shift
+            ;;
+        --no-cache)
+            USE_CACHE=0
+            shift
+            ;;
+        -*)
+            usage
+            ;;
+        *)
+            TEST_SPECS+=("$1")
+            shift
+            ;;
+    esac
+done
+
+if ! [[ "$JOBS" =~ ^[1-9][0-9]*$ ]]; then
+    echo "--jobs requires a positive integer, got '$JOBS'." >&2
+    exit 1
+fi
+
+if ! [[ "$BATCH_SIZE" =~ ^[1-9][0-9]*$ ]]; then
+    echo "--batch-size requires a positive integer, got '$BATCH_SIZE'." >&2
+    exit 1
+fi
+
+if ! [[ "$MAX_OUTPUT_KB" =~ ^[0-9]+$ ]]; then
+    echo "--max-output requires a size in KiB, got '$MAX_OUTPUT_KB'." >&2
+    exit 1
+fi
+
+MAX_OUTPUT_BYTES=$((MAX_OUTPUT_KB * 1024))
+
+# Arguments for every test run, assembled once. --test keeps vyn in Catch2 mode
+# so it exits with the test result instead of treating the test name as a file.
+# The --verbosity high for more details from Catch2.
+CATCH_RUN_ARGS=(--test --verbosity high --durations yes)
+# The --success flag includes successful tests in the output; it is left out with
+# --failures-only, which does not log passing tests.
+[ "$LOG_PASSED_OUTPUT" -eq 1 ] && CATCH_RUN_ARGS+=(--success)
 
 # Ensure the build directory exists
 if [ ! -d "$BUILD_DIR" ]; then
@@ -18,45 +103,250 @@ if [ ! -x "$TEST_EXECUTABLE" ]; then
     exit 1
 fi
 
+# Per-test output is collected here and flushed to the log in launch order
+WORK_DIR="$(mktemp -d)"
+
+# On exit, stop any tests still running (and their vyn processes) before their
+# output files are removed from under them.
+cleanup() {
+    local pids children
+    pids="$(jobs -pr)"
+    if [ -n "$pids" ]; then
+        children="$(pgrep -P "${pids//$'\n'/,}")"
+        kill $pids 2>/dev/null
+        wait $pids 2>/dev/null
+        kill $children 2>/dev/null
+    fi
+    rm -rf "$WORK_DIR" "$TEST_LIST_CACHE.$$" "$TEST_TIMINGS.$$"
+}
+trap cleanup EXIT
+
 # Clear previous log file
 > "$LOG_FILE"
 
-echo "Starting test execution... Output will be in $LOG_FILE" | tee -a "$LOG_FILE"
+echo "Starting test execution with $JOBS job(s), $BATCH_SIZE test(s) per process... Output will be in $LOG_FILE" | tee -a "$LOG_FILE"
 
-# Get the list of test cases, excluding lines with errors or empty lines
-TEST_CASES=$("$TEST_EXECUTABLE" --list-tests 2>/dev/null | grep -E '^  [A-Za-z0-9_]' | sed 's/^  //' | sed 's/\r$//')
+# Print the current time in microseconds, or nothing if this bash lacks EPOCHREALTIME.
+now_us() {
+    printf '%s' "${EPOCHREALTIME//[!0-9]/}"
+}
 
-if [ -z "$TEST_CASES" ]; then
-    echo "No test cases found by $TEST_EXECUTABLE --list-tests" | tee -a "$LOG_FILE"
-    exit 1
-fi
+# Escape Catch2 test spec metacharacters so a test name matches only itself.
+escape_test_spec() {
+    local spec="$1"
+    spec="${spec//\\/\\\\}"
+    spec="${spec//,/\\,}"
+    spec="${spec//\[/\\[}"
+    spec="${spec//\]/\\]}"
+    printf '%s' "$spec"
+}
+
+# Run one test case in the background, leaving its output, run time and exit status
+# in WORK_DIR.
+run_test_case() {
+    local index="$1"
+    local test_case="$2"
+    local status=0
+    local started
+
+    # Run the individual test case. Redirect stdout and stderr to its output file.
+    # The name is escaped like in batches, so it matches exactly this test case.
+    # stdin is detached so the test cannot consume the streamed test list.
+    started="$(now_us)"
+    "$TEST_EXECUTABLE" "$(escape_test_spec "$test_case")" "${CATCH_RUN_ARGS[@]}" > "$WORK_DIR/$index.out" 2>&1 < /dev/null || status=$?
+    if [ -n "$started" ]; then
+        echo $(($(now_us) - started)) > "$WORK_DIR/$index.time"
+    fi
+    echo "$status" > "$WORK_DIR/$index.status"
+}
+
+# Run test cases FIRST..LAST in one vyn process to amortize its startup cost.
+# If the batch fails, each test case is rerun on its own to find the culprit.
+run_test_batch() {
+    local first="$1"
+    local last="$2"
+    local index
+    local spec=""
+    local started
 
-IFS=$'\n' # Set Internal Field Separator to newline to handle test names with spaces
+    if [ "$first" -ne "$last" ]; then
+        for ((index = first; index <= last; index++)); do
+            spec+="${spec:+,}$(escape_test_spec "$(cat "$WORK_DIR/$index.name")")"
+        done
+        # Catch2 skips a spec that matches nothing and still exits 0, so make any
+        # unmatched name fail the batch and fall back to single runs.
+        started="$(now_us)"
+        if "$TEST_EXECUTABLE" "$spec" "${CATCH_RUN_ARGS[@]}" --warn UnmatchedTestSpec > "$WORK_DIR/$first.out" 2>&1 < /dev/null; then
+            # The whole batch passed; its output is logged under the first test case
+            # and its run time is split evenly across the batch.
+            for ((index = first; index <= last; index++)); do
+                [ "$index" -eq "$first" ] || : > "$WORK_DIR/$index.out"
+                if [ -n "$started" ]; then
+                    echo $((($(now_us) - started) / (last - first + 1))) > "$WORK_DIR/$index.time"
+                fi
+                echo 0 > "$WORK_DIR/$index.status"
+            done
+            return
+        fi
+    fi
+
+    for ((index = first; index <= last; index++)); do
+        run_test_case "$index" "$(cat "$WORK_DIR/$index.name")"
+    done
+}
+
+# Launch the pending batch once a job slot is free.
+BATCH_START=1
+
+launch_pending_batch() {
+    if [ "$BATCH_START" -gt "$FOUND_TESTS" ]; then
+        return
+    fi
+    # Wait for a free slot before launching the next batch
+    while [ "$(jobs -rp | wc -l)" -ge "$JOBS" ]; do
+        wait -n
+        report_finished_tests
+    done
+    run_test_batch "$BATCH_START" "$FOUND_TESTS" &
+    BATCH_START=$((FOUND_TESTS + 1))
+}
+
+# Copy a test's output file to stdout, truncated to MAX_OUTPUT_KB if a cap is set,
+# so a single runaway test cannot flood the log.
+print_test_output() {
+    local output_file="$1"
+
+    if [ "$MAX_OUTPUT_BYTES" -eq 0 ]; then
+        cat "$output_file"
+        return
+    fi
+    head -c "$MAX_OUTPUT_BYTES" "$output_file"
+    if [ "$(wc -c < "$output_file")" -gt "$MAX_OUTPUT_BYTES" ]; then
+        printf '\n[output truncated to %s KiB]\n' "$MAX_OUTPUT_KB"
+    fi
+}
+
+# Report finished test cases in launch order so parallel runs keep a readable log.
+NEXT_TO_REPORT=1
+
+report_finished_tests() {
+    local test_case status header result
+    # A status file is written in one short write, so non-empty means complete
+    while [ -s "$WORK_DIR/$NEXT_TO_REPORT.status" ]; do
+        IFS= read -r test_case < "$WORK_DIR/$NEXT_TO_REPORT.name"
+        read -r status < "$WORK_DIR/$NEXT_TO_REPORT.status"
+        header="$SEPARATOR
+RUNNING TEST: [$test_case]
+$SEPARATOR"
+        if [ "$status" -eq 0 ]; then
+            result="PASSED: [$test_case]"
+        else
+            result="FAILED or HUNG: [$test_case]
+Check $LOG_FILE for details."
+        fi
+        # Build each test's block once and append it in a single write, rather
+        # than piping every line through its own tee.
+        printf '%s\n%s\n' "$header" "$result"
+        {
+            printf '%s\n' "$header"
+            if [ "$status" -ne 0 ] || [ "$LOG_PASSED_OUTPUT" -eq 1 ]; then
+                print_test_output "$WORK_DIR/$NEXT_TO_REPORT.out"
+            fi
+            printf '%s\n' "$result"
+        } >> "$LOG_FILE"
+        # The output is no longer needed once logged
+        rm -f "$WORK_DIR/$NEXT_TO_REPORT.out"
+        if [ -e "$WORK_DIR/$NEXT_TO_REPORT.time" ]; then
+            printf '%s\t%s\n' "$(< "$WORK_DIR/$NEXT_TO_REPORT.time")" "$test_case" >> "$WORK_DIR/timings"
+        fi
+        NEXT_TO_REPORT=$((NEXT_TO_REPORT + 1))
+    done
+}
+
+# Keep only the test name lines of a Catch2 listing, stripping their indent and any
+# trailing CR, in a single pass over the listing.
+filter_test_names() {
+    sed -n -e 's/\r$//' -e 's/^  \([A-Za-z0-9_]\)/\1/p'
+}
+
+# Print the test case names, excluding lines with errors or empty lines. The
+# listing costs a full vyn startup, so it is cached until the executable is rebuilt.
+# Test specs are applied by Catch2 while listing, so unselected tests are never
+# queued; only the full, unfiltered listing is cached.
+list_test_cases() {
+    if [ "$USE_CACHE" -eq 0 ] || [ ${#TEST_SPECS[@]} -gt 0 ]; then
+        "$TEST_EXECUTABLE" --test --list-tests "${TEST_SPECS[@]}" 2>/dev/null | filter_test_names
+    elif [ "$TEST_LIST_CACHE" -nt "$TEST_EXECUTABLE" ]; then
+        cat "$TEST_LIST_CACHE"
+    else
+        # Write to a temporary file and rename it into place, so an interrupted or
+        # concurrent run never sees a partial listing. An empty listing is never kept.
+        "$TEST_EXECUTABLE" --test --list-tests 2>/dev/null | filter_test_names | tee "$TEST_LIST_CACHE.$$"
+        if [ -s "$TEST_LIST_CACHE.$$" ]; then
+            mv -f "$TEST_LIST_CACHE.$$" "$TEST_LIST_CACHE"
+        fi
+    fi
+}
+
+# Reorder test names so those that were slowest last time start first, and a long
+# test is not left running alone at the end of a parallel run. Tests with no
+# recorded time are treated as slowest; ties keep their listing order.
+order_by_timings() {
+    if [ ! -s "$TEST_TIMINGS" ]; then
+        cat
+        return
+    fi
+    awk -F '\t' 'NR == FNR { time[$2] = $1; next }
+                 { print (($0 in time) ? time[$0] : "999999999999") "\t" $0 }' "$TEST_TIMINGS" - |
+        sort -s -t $'\t' -k1,1nr | cut -f2-
+}
+
+# Record this run's test timings for the next run, keeping entries for tests that
+# did not run this time. The file is replaced atomically like the listing cache.
+save_timings() {
+    local previous="$TEST_TIMINGS"
+
+    if [ ! -s "$WORK_DIR/timings" ]; then
+        return
+    fi
+    [ -e "$previous" ] || previous=/dev/null
+    awk -F '\t' 'NR == FNR { time[$2] = $1; next }
+                 !($2 in time) { print }
+                 END { for (name in time) print time[name] "\t" name }' \
+        "$WORK_DIR/timings" "$previous" > "$TEST_TIMINGS.$$"
+    mv -f "$TEST_TIMINGS.$$" "$TEST_TIMINGS"
+}
 
-for test_case in $TEST_CASES; do
+# Stream the list of test cases straight into the run loop instead of holding
+# the whole listing in memory first.
+FOUND_TESTS=0
+
+while IFS= read -r test_case; do
     # Skip lines that are actually tags (e.g., starting with '[')
     if [[ "$test_case" == \[* ]]; then
         continue
     fi
-    echo "------------------------------------------------------------" | tee -a "$LOG_FILE"
-    echo "RUNNING TEST: [$test_case]" | tee -a "$LOG_FILE"
-    echo "------------------------------------------------------------" | tee -a "$LOG_FILE"
-    
-    # Run the individual test case. Redirect stdout and stderr to the log file.
-    # The --success flag includes successful tests in the output.
-    # The --verbosity high for more details from Catch2.
-    # Pass the test_case directly, ensuring it's quoted to handle spaces.
-    if "$TEST_EXECUTABLE" "$test_case" --success --verbosity high --durations yes >> "$LOG_FILE" 2>&1; then
-        echo "PASSED: [$test_case]" | tee -a "$LOG_FILE"
-    else
-        echo "FAILED or HUNG: [$test_case]" | tee -a "$LOG_FILE"
-        echo "Check $LOG_FILE for details." | tee -a "$LOG_FILE"
-        # Optionally, you might want to exit here if a test fails or hangs
-        # exit 1 
+    FOUND_TESTS=$((FOUND_TESTS + 1))
+    echo "$test_case" > "$WORK_DIR/$FOUND_TESTS.name"
+
+    if [ $((FOUND_TESTS - BATCH_START + 1)) -ge "$BATCH_SIZE" ]; then
+        launch_pending_batch
     fi
+done < <(list_test_cases | order_by_timings)
+
+launch_pending_batch
+# Keep reporting as the remaining tests finish, not only once all of them have
+while [ -n "$(jobs -rp)" ]; do
+    wait -n
+    report_finished_tests
 done
+report_finished_tests
+save_timings
 
-IFS=$' \t\n' # Reset IFS
+if [ "$FOUND_TESTS" -eq 0 ]; then
+    echo "No test cases found by $TEST_EXECUTABLE --test --list-tests ${TEST_SPECS[*]}" | tee -a "$LOG_FILE"
+    exit 1
+fi
 
-echo "------------------------------------------------------------" | tee -a "$LOG_FILE"
+echo "$SEPARATOR" | tee -a "$LOG_FILE"
 echo "All tests completed. Check $LOG_FILE for full output." | tee -a "$LOG_FILE"